@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+from argparse import ArgumentParser
+from array import array
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+for ex in ('ex0', 'ex1', 'ex2'):
+    sys.path.insert(0, os.path.join(ROOT, ex))
+
+from stream_processor import (  # noqa: E402
+    LogProcessor, NumericProcessor, TextProcessor)
+from data_stream import (  # noqa: E402
+    EventStream, SensorStream, TransactionStream)
+from nexus_pipeline import (  # noqa: E402
+    CSVAdapter, InputStage, JSONAdapter, NexusManager, OutputStage,
+    StreamAdapter, TransformStage)
+
+Ops = List[Callable[[], Any]]
+Case = Callable[[int], Tuple[Ops, int]]
+Results = Dict[str, Dict[str, Dict[str, float]]]
+
+SUB_BATCH = 1000
+
+
+def sub_batches(items: List[Any], size: int = SUB_BATCH) -> List[List[Any]]:
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def numeric_process(n: int) -> Tuple[Ops, int]:
+    processor = NumericProcessor()
+    data = list(range(n))
+    return [lambda: processor.process(data)], n
+
+
+def numeric_batch(n: int) -> Tuple[Ops, int]:
+    processor = NumericProcessor()
+    series = [array('d', range(100))] * max(n // 100, 1)
+    return ([partial(processor.process_batch, batch)
+             for batch in sub_batches(series, 10)], 100 * len(series))
+
+
+def text_process(n: int) -> Tuple[Ops, int]:
+    processor = TextProcessor()
+    data = "nexus " * n
+    return [lambda: processor.process(data)], n
+
+
+def text_stream(n: int) -> Tuple[Ops, int]:
+    processor = TextProcessor()
+    data = "nexus " * n
+    chunks = [data[i:i + 65536] for i in range(0, len(data), 65536)]
+    return [lambda: processor.summarize_stream(chunks)], n
+
+
+def log_process(n: int) -> Tuple[Ops, int]:
+    processor = LogProcessor()
+    lines = ["ERROR: Connection timeout", "INFO: System ready"] * (n // 2)
+    return [partial(processor.process, line) for line in lines], len(lines)
+
+
+def sensor_batches(n: int) -> Tuple[Ops, int]:
+    readings = [[22.5 + i % 40, 20 + i % 70, 1013] for i in range(n)]
+    stream = SensorStream("SENSOR_BENCH")
+    return ([partial(stream.process_batch, reading) for reading in readings],
+            len(readings))
+
+
+def transaction_batch(n: int) -> Tuple[Ops, int]:
+    amounts = [(i % 200 - 100) * 150 or 1 for i in range(n)]
+    stream = TransactionStream("TRANS_BENCH")
+    return ([partial(stream.process_batch, batch)
+             for batch in sub_batches(amounts)], len(amounts))
+
+
+def event_batch(n: int) -> Tuple[Ops, int]:
+    events = ['login', 'ssh', 'error', 'logout'] * (n // 4)
+    stream = EventStream("EVENT_BENCH")
+    return ([partial(stream.process_batch, batch)
+             for batch in sub_batches(events)], len(events))
+
+
+def build_manager() -> NexusManager:
+    manager = NexusManager()
+    for adapter in (JSONAdapter("JSON"), CSVAdapter("CSV"),
+                    StreamAdapter("Stream")):
+        adapter.add_stage(InputStage())
+        adapter.add_stage(TransformStage())
+        adapter.add_stage(OutputStage())
+        manager.add_pipeline(adapter)
+    for name, stage in (("JSON_001", InputStage()),
+                        ("JSON_002", TransformStage()),
+                        ("JSON_003", OutputStage())):
+        link = JSONAdapter(name)
+        link.add_stage(stage)
+        manager.add_pipeline(link)
+    manager.add_chain('chaining', ["JSON_001", "JSON_002", "JSON_003"])
+    return manager
+
+
+def nexus_route(record: Any, mode: str = 'simple') -> Case:
+    def case(n: int) -> Tuple[Ops, int]:
+        manager = build_manager()
+        op = partial(manager.process_pipeline, record, mode)
+        return [op] * n, n
+    return case
+
+
+def nexus_many(n: int) -> Tuple[Ops, int]:
+    manager = build_manager()
+    records = [{"sensor": "temp", "value": 23.5, "unit": "C"},
+               "User,login,2026-02-01 10:05:20",
+               [22.0, 10.7, 15.4, 23.6, 20.7]] * (n // 3)
+    return ([partial(manager.process_many, batch)
+             for batch in sub_batches(records, 300)], len(records))
+
+
+CASES: Dict[str, Case] = {
+    'numeric.process': numeric_process,
+    'numeric.batch': numeric_batch,
+    'text.process': text_process,
+    'text.stream': text_stream,
+    'log.process': log_process,
+    'sensor.batches': sensor_batches,
+    'transaction.batch': transaction_batch,
+    'event.batch': event_batch,
+    'nexus.json': nexus_route({"sensor": "temp", "value": 23.5,
+                               "unit": "C"}),
+    'nexus.csv': nexus_route("User,login,2026-02-01 10:05:20"),
+    'nexus.stream': nexus_route([22.0, 10.7, 15.4, 23.6, 20.7]),
+    'nexus.chain': nexus_route({"sensor": "temp", "value": 80.5,
+                                "unit": "F"}, 'chaining'),
+    'nexus.many': nexus_many,
+}
+
+
+def percentile(samples: List[float], q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+def run_all(ops: Ops) -> None:
+    for op in ops:
+        op()
+
+
+def clock_overhead(rounds: int = 1000) -> float:
+    clock = time.perf_counter
+    return min(-clock() + clock() for _ in range(rounds))
+
+
+def measure(case: Case, size: int, repeat: int, min_samples: int,
+            budget: float) -> Dict[str, float]:
+    ops, count = case(size)
+    run_all(ops)
+    passes = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run_all(ops)
+        passes.append(time.perf_counter() - start)
+
+    clock = time.perf_counter
+    overhead = clock_overhead()
+    latencies: List[float] = []
+    deadline = clock() + budget
+    while not latencies or \
+            (len(latencies) < min_samples and clock() < deadline):
+        for op in ops:
+            start = clock()
+            op()
+            latencies.append(max(clock() - start - overhead, 0.0))
+
+    tracemalloc.start()
+    run_all(ops)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    wall = percentile(passes, 0.5)
+    return {
+        'elements': count,
+        'throughput': count / wall if wall else float('inf'),
+        'samples': len(latencies),
+        'p50': percentile(latencies, 0.5),
+        'p95': percentile(latencies, 0.95),
+        'p99': percentile(latencies, 0.99),
+        'peak_kb': peak / 1024
+    }
+
+
+def compare(results: Results, baseline: Results,
+            threshold: float) -> List[Tuple[str, str, float]]:
+    regressions = []
+    for name, sizes in results.items():
+        for size, stats in sizes.items():
+            old = baseline.get(name, {}).get(size)
+            if old is None or not old['throughput']:
+                continue
+            change = stats['throughput'] / old['throughput'] - 1
+            if change < -threshold:
+                regressions.append((name, size, change))
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = ArgumentParser(description="Code Nexus benchmark suite")
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[10, 100, 1000, 10000, 100000])
+    parser.add_argument('--repeat', type=int, default=5,
+                        help="timed passes for throughput")
+    parser.add_argument('--samples', type=int, default=1000,
+                        help="minimum per-operation latency samples")
+    parser.add_argument('--budget', type=float, default=2.0,
+                        help="seconds allowed for latency sampling")
+    parser.add_argument('--only', nargs='+', default=None,
+                        help="case name prefixes to run")
+    parser.add_argument('--save', help="write results to this JSON file")
+    parser.add_argument('--compare', help="baseline JSON file to check")
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help="allowed throughput drop (0.10 = 10%%)")
+    args = parser.parse_args(argv)
+
+    results: Results = {}
+    print(f"{'case':<20}{'size':>10}{'elements':>10}{'elems/s':>14}"
+          f"{'samples':>9}{'p50 us':>11}{'p95 us':>11}{'p99 us':>11}"
+          f"{'peak KiB':>11}")
+    for name, case in CASES.items():
+        if args.only and not any(name.startswith(p) for p in args.only):
+            continue
+        for size in args.sizes:
+            stats = measure(case, size, max(args.repeat, 1),
+                            args.samples, args.budget)
+            results.setdefault(name, {})[str(size)] = stats
+            print(f"{name:<20}{size:>10}{stats['elements']:>10.0f}"
+                  f"{stats['throughput']:>14.0f}{stats['samples']:>9.0f}"
+                  f"{stats['p50'] * 1e6:>11.1f}{stats['p95'] * 1e6:>11.1f}"
+                  f"{stats['p99'] * 1e6:>11.1f}{stats['peak_kb']:>11.1f}")
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        for name, size, change in regressions:
+            print(f"REGRESSION {name} size={size}: "
+                  f"{change * 100:.1f}% throughput")
+        if regressions:
+            return 1
+        print("No regressions against baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
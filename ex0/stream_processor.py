@@ -1,109 +1,392 @@
 #!/usr/bin/env python3
-from typing import Any
+from typing import (Any, Dict, Iterable, Iterator, List, Optional, Sequence,
+                    TextIO, Tuple, Type, Union)
 from abc import ABC, abstractmethod
+from array import array
+from codecs import getincrementaldecoder
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from operator import mul, sub
+from weakref import WeakSet
+import atexit
+import mmap
+import sys
+
+
+class ProcessResult:
+    __slots__ = ()
+    ok = True
+
+
+class ProcessError(ProcessResult):
+    __slots__ = ('message',)
+    ok = False
+
+    def __init__(self, message: str = "An unexpected error occured") -> None:
+        self.message = message
+
+    def __str__(self) -> str:
+        return self.message
+
+
+class NumericSummary(ProcessResult):
+    __slots__ = ('data', 'count', 'total', 'avg', '_low', '_high',
+                 '_variance')
+
+    def __init__(self, data: Sequence[Any], count: int, total: Any) -> None:
+        self.data = data
+        self.count = count
+        self.total = total
+        self.avg = total / count
+        self._low: Any = None
+        self._high: Any = None
+        self._variance: Optional[float] = None
+
+    @property
+    def low(self) -> Any:
+        if self._low is None:
+            self._low = min(self.data)
+        return self._low
+
+    @property
+    def high(self) -> Any:
+        if self._high is None:
+            self._high = max(self.data)
+        return self._high
+
+    @property
+    def variance(self) -> float:
+        if self._variance is None:
+            data, count = self.data, self.count
+            if isinstance(self.total, int):
+                squares = sum(map(mul, data, data))
+                self._variance = \
+                    (count * squares - self.total * self.total) / count ** 2
+            else:
+                shifted = list(map(sub, data, repeat(self.avg)))
+                self._variance = sum(map(mul, shifted, shifted)) / count
+        return self._variance
+
+    def __str__(self) -> str:
+        return (f"Processed {self.count} numeric values, "
+                f"sum={self.total}, avg={self.avg}")
+
+
+class TextSummary(ProcessResult):
+    __slots__ = ('chars', 'words')
+
+    def __init__(self, chars: int, words: int) -> None:
+        self.chars = chars
+        self.words = words
+
+    def __str__(self) -> str:
+        return (f"Processed text: {self.chars} characters, "
+                f"{self.words} words")
+
+
+class LogEntry(ProcessResult):
+    __slots__ = ('level', 'message')
+
+    def __init__(self, level: str, message: str) -> None:
+        self.level = level
+        self.message = message
+
+    def __str__(self) -> str:
+        tag = "ALERT" if self.level in ("ERROR", "CRITICAL") else "INFO"
+        return f"[{tag}] {self.level} level detected: {self.message}"
+
+
+class LogIndex:
+    __slots__ = ('path', 'offsets', 'encoding')
+
+    def __init__(self, path: str, encoding: str = 'utf-8') -> None:
+        self.path = path
+        self.offsets: Dict[str, array] = {}
+        self.encoding = encoding
+
+    def add(self, level: str, offset: int) -> None:
+        bucket = self.offsets.get(level)
+        if bucket is None:
+            bucket = self.offsets[level] = array('Q')
+        bucket.append(offset)
+
+    def count(self, level: str) -> int:
+        bucket = self.offsets.get(level)
+        return 0 if bucket is None else len(bucket)
+
+    def levels(self) -> List[str]:
+        return list(self.offsets)
+
+    def lines(self, level: str) -> Iterator[LogEntry]:
+        bucket = self.offsets.get(level)
+        if not bucket:
+            return
+        with open(self.path, 'rb') as f, \
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for offset in bucket:
+                end = mm.find(b'\n', offset)
+                if end == -1:
+                    end = len(mm)
+                line = mm[offset:end].rstrip(b'\r').decode(self.encoding)
+                if level != 'UNKNOWN':
+                    line = line.partition(': ')[2]
+                yield LogEntry(level, line)
+
+
+class Reporter:
+    def sample(self) -> bool:
+        return False
+
+    def emit(self, message: str) -> None:
+        ...
+
+    def flush(self) -> None:
+        ...
+
+
+class PrintReporter(Reporter):
+    def __init__(self, every: int = 1, buffer_size: int = 1,
+                 stream: Optional[TextIO] = None) -> None:
+        self.every = every
+        self.buffer_size = buffer_size
+        self.stream = stream
+        self.seen = 0
+        self.buffer: List[str] = []
+        if buffer_size > 1:
+            _BUFFERED.add(self)
+
+    def __enter__(self) -> "PrintReporter":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.flush()
+
+    def __del__(self) -> None:
+        self.flush()
+
+    def sample(self) -> bool:
+        self.seen += 1
+        return (self.seen - 1) % self.every == 0
+
+    def emit(self, message: str) -> None:
+        self.buffer.append(message)
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if self.buffer:
+            stream = self.stream or sys.stdout
+            stream.write('\n'.join(self.buffer) + '\n')
+            self.buffer.clear()
+
+
+_BUFFERED: "WeakSet[PrintReporter]" = WeakSet()
+
+
+@atexit.register
+def _flush_reporters() -> None:
+    for reporter in list(_BUFFERED):
+        reporter.flush()
 
 
 class DataProcessor(ABC):
 
+    def __init__(self, reporter: Optional[Reporter] = None) -> None:
+        self.reporter = reporter or Reporter()
+
     @abstractmethod
-    def process(self, data: Any) -> str:
+    def summarize(self, data: Any) -> ProcessResult:
         ...
 
     @abstractmethod
     def validate(self, data: Any) -> bool:
         ...
 
-    def format_output(self, result: str) -> str:
-        return result
+    def process(self, data: Any) -> ProcessResult:
+        try:
+            return self.summarize(data)
+        except Exception as e:
+            if self.reporter.sample():
+                self.reporter.emit(str(e))
+            return ProcessError()
+
+    def format_output(self, result: ProcessResult) -> str:
+        return str(result)
 
 
 class NumericProcessor(DataProcessor):
 
-    def process(self, data: Any) -> str:
-        ret = "An unexpected error occured"
-        try:
-            result = f"{len(data)} "
-            result += f"{sum(data)} "
-            result += f"{sum(data) / len(data)}"
-            ret = self.format_output(result)
-            if ret == "An unexpected error occured":
-                raise Exception(ret)
-        except Exception as e:
-            print(e)
-        finally:
-            return ret
+    def summarize(self, data: Sequence[Any]) -> NumericSummary:
+        count = len(data)
+        if count == 0:
+            raise ValueError("Error: empty numeric series")
+        return NumericSummary(data, count, sum(data))
+
+    def process_batch(self, batch: Iterable[Sequence[Any]]
+                      ) -> List[ProcessResult]:
+        return list(map(self.process, batch))
 
     def validate(self, data: Any) -> bool:
-        print(f"Processing data: {data}")
+        if self.reporter.sample():
+            self.reporter.emit(f"Processing data: {data}")
         for d in data:
             if isinstance(d, int) is False:
                 return False
         return True
 
-    def format_output(self, result: str) -> str:
-        d1, d2, d3 = result.split()
-        return f"Processed {d1} numeric values, sum={d2}, avg={d3}"
-
 
 class TextProcessor(DataProcessor):
 
-    def process(self, data: Any) -> str:
-        ret = "An unexpected error occured"
-        try:
-            result = f"{len(data)} "
-            result += f"{len(data.split())}"
-            ret = self.format_output(result)
-            if ret == "An unexpected error occured":
-                raise Exception(ret)
-        except Exception as e:
-            print(e)
-        finally:
-            return ret
+    def summarize(self, data: str) -> TextSummary:
+        return TextSummary(len(data), len(data.split()))
+
+    def summarize_stream(self, chunks: Iterable[Union[str, bytes]],
+                         encoding: str = 'utf-8') -> TextSummary:
+        decoder = getincrementaldecoder(encoding)()
+        chars = 0
+        words = 0
+        in_word = False
+        for chunk in self._decode(chunks, decoder):
+            if not chunk:
+                continue
+            chars += len(chunk)
+            words += len(chunk.split())
+            if in_word and not chunk[0].isspace():
+                words -= 1
+            in_word = not chunk[-1].isspace()
+        return TextSummary(chars, words)
+
+    def summarize_file(self, path: str, chunk_size: int = 1 << 20,
+                       encoding: str = 'utf-8') -> TextSummary:
+        with open(path, 'rb') as f:
+            try:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                return TextSummary(0, 0)
+            with mm:
+                chunks = (mm[i:i + chunk_size]
+                          for i in range(0, len(mm), chunk_size))
+                return self.summarize_stream(chunks, encoding)
+
+    @staticmethod
+    def _decode(chunks: Iterable[Union[str, bytes]],
+                decoder: Any) -> Iterator[str]:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                yield chunk
+            else:
+                yield decoder.decode(chunk)
+        yield decoder.decode(b'', final=True)
 
     def validate(self, data: Any) -> bool:
-        print(f'Processing data: "{data}"')
+        if self.reporter.sample():
+            self.reporter.emit(f'Processing data: "{data}"')
         if isinstance(data, str) is True:
             return True
         return False
 
-    def format_output(self, result: str) -> str:
-        d1, d2 = result.split()
-        return f"Processed text: {d1} characters, {d2} words"
-
 
 class LogProcessor(DataProcessor):
+    levels = ('CRITICAL', 'ERROR', 'WARNING', 'INFO', 'DEBUG')
 
-    def __init__(self) -> None:
-        ...
+    def __init__(self, reporter: Optional[Reporter] = None) -> None:
+        super().__init__(reporter)
 
-    def process(self, data: Any) -> str:
-        ret = "An unexpected error occured"
-        try:
-
-            ret = self.format_output(data)
-            if ret == "An unexpected error occured":
-                raise Exception(ret)
-        except Exception as e:
-            print(e)
-        finally:
-            return ret
+    def summarize(self, data: str) -> LogEntry:
+        level, sep, message = data.partition(': ')
+        if not sep:
+            raise ValueError("Error: Invalid log entry")
+        return LogEntry(level, message)
 
     def validate(self, data: Any) -> bool:
-        print(f'Processing data: "{data}"')
-        if data.split()[0] == "ERROR:" or data.split()[0] == "INFO:":
-            return True
-        return False
+        if self.reporter.sample():
+            self.reporter.emit(f'Processing data: "{data}"')
+        return self.is_entry(data)
+
+    @classmethod
+    def is_entry(cls, data: str) -> bool:
+        level, sep, _ = data.partition(': ')
+        return bool(sep) and level in cls.levels
+
+    def index_file(self, path: str, encoding: str = 'utf-8',
+                   buffer_size: int = 1 << 20) -> LogIndex:
+        index = LogIndex(path, encoding)
+        known = {lv.encode(encoding): lv for lv in self.levels}
+        offset = 0
+        with open(path, 'rb', buffering=buffer_size) as f:
+            for line in f:
+                head, sep, _ = line.partition(b': ')
+                level = known.get(head) if sep else None
+                index.add(level or 'UNKNOWN', offset)
+                offset += len(line)
+        return index
 
-    def format_output(self, result: str) -> str:
-        if result.split()[0] == "ERROR:":
-            info = result.removeprefix('ERROR: ')
-            state = result.removesuffix(f": {info}")
-            res = f"[ALERT] {state} level detected: {info}"
+
+_DISPATCH: Dict[type, Type[DataProcessor]] = {
+    list: NumericProcessor,
+    tuple: NumericProcessor,
+    array: NumericProcessor,
+    str: TextProcessor,
+}
+
+
+def processor_for(data: Any) -> Type[DataProcessor]:
+    kind = _DISPATCH.get(type(data))
+    if kind is None:
+        for base in type(data).__mro__[1:]:
+            if base in _DISPATCH:
+                kind = _DISPATCH[type(data)] = _DISPATCH[base]
+                break
         else:
-            info = result.removeprefix('INFO: ')
-            state = result.removesuffix(f": {info}")
-            res = f"[INFO] {state} level detected: {info}"
-        return (res)
+            raise TypeError(f"Error: no processor for {type(data).__name__}")
+    if kind is TextProcessor and LogProcessor.is_entry(data):
+        return LogProcessor
+    return kind
+
+
+def _process_group(kind: Type[DataProcessor],
+                   items: List[Any]) -> List[ProcessResult]:
+    processor = kind()
+    return [processor.process(item) for item in items]
+
+
+def process_many(items: Iterable[Any], workers: Optional[int] = None,
+                 chunk_size: int = 10000,
+                 min_parallel: int = 50000) -> List[ProcessResult]:
+    groups: Dict[Type[DataProcessor], Tuple[List[int], List[Any]]] = {}
+    unsupported: Dict[int, ProcessError] = {}
+    total = 0
+    for i, item in enumerate(items):
+        total = i + 1
+        try:
+            kind = processor_for(item)
+        except TypeError as e:
+            unsupported[i] = ProcessError(str(e))
+            continue
+        indices, members = groups.setdefault(kind, ([], []))
+        indices.append(i)
+        members.append(item)
+
+    results: List[Any] = [None] * total
+    for i, error in unsupported.items():
+        results[i] = error
+    jobs = [(kind, indices[start:start + chunk_size],
+             members[start:start + chunk_size])
+            for kind, (indices, members) in groups.items()
+            for start in range(0, len(members), chunk_size)]
+    serial = workers == 1 or \
+        (workers is None and total - len(unsupported) < min_parallel)
+    if serial or len(jobs) <= 1:
+        outputs = [_process_group(kind, chunk) for kind, _, chunk in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            outputs = list(pool.map(_process_group,
+                                    [kind for kind, _, _ in jobs],
+                                    [chunk for _, _, chunk in jobs]))
+    for (_, indices, _), output in zip(jobs, outputs):
+        for i, result in zip(indices, output):
+            results[i] = result
+    return results
 
 
 def ft_stream_processor() -> None:
@@ -111,7 +394,7 @@ def ft_stream_processor() -> None:
 
     data1 = [1, 2, 3, 4, 5]
     print("Initializing Numeric Processor...")
-    num = NumericProcessor()
+    num = NumericProcessor(PrintReporter())
     try:
         if num.validate(data1) is True:
             print("Validation: Numeric data verified")
@@ -126,7 +409,7 @@ def ft_stream_processor() -> None:
 
     data2 = "Hello Nexus World"
     print("Initializing Text Processor...")
-    words = TextProcessor()
+    words = TextProcessor(PrintReporter())
     try:
         if words.validate(data2) is True:
             print("Validation: Text data verified")
@@ -141,7 +424,7 @@ def ft_stream_processor() -> None:
 
     data3 = "ERROR: Connection timeout"
     print("Initializing Log Processor...")
-    log = LogProcessor()
+    log = LogProcessor(PrintReporter())
     try:
         if log.validate(data3) is True:
             print("Validation: Log entry verified")
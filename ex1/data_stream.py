@@ -1,117 +1,920 @@
 #!/usr/bin/env python3
 from abc import ABC, abstractmethod
-from typing import Any, List, Dict, Union, Optional
+from array import array
+from bisect import bisect_right, insort
+from collections import Counter, deque
+from functools import partial
+from itertools import islice
+import heapq
+import math
+from operator import gt, lt
+from typing import (Any, List, Dict, Union, Optional, Deque, Tuple,
+                    Iterator, TextIO, BinaryIO, AsyncIterator, Iterable,
+                    Callable)
+import asyncio
+import mmap
+import multiprocessing
+import os
+import queue
+import struct
+import sys
+import time
+import zlib
+
+
+class AlertLog:
+    __slots__ = ('recent', 'counts', 'total')
+
+    def __init__(self, capacity: int = 1024) -> None:
+        self.recent: Deque[Tuple[float, str, str]] = deque(maxlen=capacity)
+        self.counts: Counter = Counter()
+        self.total = 0
+
+    def add(self, category: str, message: str,
+            timestamp: Optional[float] = None) -> None:
+        if timestamp is None:
+            timestamp = time.time()
+        self.recent.append((timestamp, category, message))
+        self.counts[category] += 1
+        self.total += 1
+
+    def __len__(self) -> int:
+        return self.total
+
+    def count(self, category: str) -> int:
+        return self.counts[category]
+
+    def last(self, n: Optional[int] = None) -> List[str]:
+        if n is None:
+            return [message for _, _, message in self.recent]
+        newest = [message for _, _, message
+                  in islice(reversed(self.recent), n)]
+        newest.reverse()
+        return newest
+
+    def since(self, timestamp: float) -> int:
+        count = 0
+        for ts, _, _ in reversed(self.recent):
+            if ts < timestamp:
+                break
+            count += 1
+        return count
+
+
+EPSILON = 1e-9
+
+
+class Pane:
+    __slots__ = ('count', 'total', 'low', 'high')
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.low = 0.0
+        self.high = 0.0
+
+    def add(self, value: float) -> None:
+        if self.count == 0:
+            self.low = self.high = value
+        elif value < self.low:
+            self.low = value
+        elif value > self.high:
+            self.high = value
+        self.count += 1
+        self.total += value
+
+    def merged(self, other: "Pane") -> "Pane":
+        pane = Pane()
+        for part in (self, other):
+            if part.count == 0:
+                continue
+            if pane.count == 0:
+                pane.low, pane.high = part.low, part.high
+            else:
+                pane.low = min(pane.low, part.low)
+                pane.high = max(pane.high, part.high)
+            pane.count += part.count
+            pane.total += part.total
+        return pane
+
+
+class WindowStats:
+    __slots__ = ('start', 'end', 'count', 'total', 'low', 'high')
+
+    def __init__(self, start: float, end: float, panes: List[Pane]) -> None:
+        self.start = start
+        self.end = end
+        self.count = 0
+        self.total = 0.0
+        self.low = 0.0
+        self.high = 0.0
+        for pane in panes:
+            if pane.count == 0:
+                continue
+            if self.count == 0:
+                self.low = pane.low
+                self.high = pane.high
+            else:
+                self.low = min(self.low, pane.low)
+                self.high = max(self.high, pane.high)
+            self.count += pane.count
+            self.total += pane.total
+
+    @property
+    def avg(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def snapshot(self) -> Dict[str, Union[str, int, float]]:
+        return {
+                'start': self.start,
+                'end': self.end,
+                'nb': self.count,
+                'sum': self.total,
+                'avg': self.avg,
+                'min': self.low,
+                'max': self.high
+        }
+
+
+class WindowAggregator:
+    def __init__(self, size: float, slide: Optional[float] = None,
+                 channel: Optional[str] = None, history: int = 1024) -> None:
+        self.slide = slide or size
+        self.width = round(size / self.slide)
+        if self.width < 1 or \
+                abs(self.width * self.slide - size) > EPSILON * size:
+            raise ValueError("window size must be a multiple of its slide")
+        self.size = size
+        self.channel = channel
+        self.ring: Deque[Pane] = deque()
+        self.front: List[Pane] = []
+        self.back = Pane()
+        self.results: Deque[WindowStats] = deque(maxlen=history)
+        self.next_window: Optional[int] = None
+        self.watermark = 0
+        self.late = 0
+
+    def pane_index(self, timestamp: float) -> int:
+        return math.floor(timestamp / self.slide + EPSILON)
+
+    def add(self, timestamp: float, value: float) -> None:
+        index = self.pane_index(timestamp)
+        if self.next_window is None:
+            self.next_window = index - self.width + 1
+            self.watermark = index
+            self.ring.extend(Pane() for _ in range(self.width))
+        elif index < self.next_window:
+            self.late += 1
+            return
+        elif index > self.watermark:
+            self._close(index - self.width)
+            top = self.next_window + len(self.ring) - 1
+            self.ring.extend(Pane() for _ in range(index - top))
+            self.watermark = index
+        position = index - self.next_window
+        self.ring[position].add(value)
+        split = len(self.front)
+        if position >= split:
+            self.back.add(value)
+            return
+        for merged in self.front[split - 1 - position:]:
+            merged.add(value)
+
+    def flush(self) -> None:
+        if self.next_window is not None:
+            self._close(self.watermark)
+
+    def current(self) -> WindowStats:
+        return self._window(self.watermark - self.width + 1)
+
+    def _parts(self) -> List[Pane]:
+        if self.front:
+            return [self.front[-1], self.back]
+        return [self.back]
+
+    def _close(self, last: int) -> None:
+        assert self.next_window is not None
+        while self.next_window <= last and \
+                any(pane.count for pane in self._parts()):
+            self.results.append(self._window(self.next_window))
+            self._pop()
+            self.next_window += 1
+        if self.next_window <= last:
+            self.ring.clear()
+            self.front.clear()
+            self.back = Pane()
+            self.next_window = last + 1
+
+    def _pop(self) -> None:
+        if not self.front:
+            merged = Pane()
+            for pane in reversed(self.ring):
+                merged = merged.merged(pane)
+                self.front.append(merged)
+            self.back = Pane()
+        self.ring.popleft()
+        self.front.pop()
+
+    def _window(self, first: int) -> WindowStats:
+        return WindowStats(first * self.slide,
+                           first * self.slide + self.size, self._parts())
+
+
+class Predicate(ABC):
+    def __init__(self) -> None:
+        self.fn: Optional[Callable[[Any], bool]] = None
+
+    @abstractmethod
+    def build(self) -> Callable[[Any], bool]:
+        ...
+
+    def compile(self) -> Callable[[Any], bool]:
+        if self.fn is None:
+            self.fn = self.build()
+        return self.fn
+
+    def mask(self, data_batch: List[Any]) -> List[bool]:
+        return list(map(self.compile(), data_batch))
+
+    def __and__(self, other: "Predicate") -> "Predicate":
+        return AllOf(self, other)
+
+    def __or__(self, other: "Predicate") -> "Predicate":
+        return AnyOf(self, other)
+
+
+class Above(Predicate):
+    def __init__(self, threshold: float) -> None:
+        super().__init__()
+        self.threshold = threshold
+
+    def build(self) -> Callable[[Any], bool]:
+        return partial(lt, self.threshold)
+
+
+class Below(Predicate):
+    def __init__(self, threshold: float) -> None:
+        super().__init__()
+        self.threshold = threshold
+
+    def build(self) -> Callable[[Any], bool]:
+        return partial(gt, self.threshold)
+
+
+class Between(Predicate):
+    def __init__(self, low: float, high: float) -> None:
+        super().__init__()
+        self.low = low
+        self.high = high
+
+    def build(self) -> Callable[[Any], bool]:
+        low, high = self.low, self.high
+        return lambda x: low <= x <= high
+
+
+class OneOf(Predicate):
+    def __init__(self, names: Iterable[Any]) -> None:
+        super().__init__()
+        self.names = frozenset(names)
+
+    def build(self) -> Callable[[Any], bool]:
+        return self.names.__contains__
+
+
+class Field(Predicate):
+    def __init__(self, index: int, predicate: Predicate) -> None:
+        super().__init__()
+        self.index = index
+        self.predicate = predicate
+
+    def build(self) -> Callable[[Any], bool]:
+        index, fn = self.index, self.predicate.compile()
+        return lambda x: fn(x[index])
+
+
+class AllOf(Predicate):
+    def __init__(self, *predicates: Predicate) -> None:
+        super().__init__()
+        self.predicates = predicates
+
+    def build(self) -> Callable[[Any], bool]:
+        fns = [p.compile() for p in self.predicates]
+        if len(fns) == 2:
+            first, second = fns
+            return lambda x: first(x) and second(x)
+        return lambda x: all(fn(x) for fn in fns)
+
+    def __and__(self, other: Predicate) -> Predicate:
+        return AllOf(*self.predicates, other)
+
+
+class AnyOf(Predicate):
+    def __init__(self, *predicates: Predicate) -> None:
+        super().__init__()
+        self.predicates = predicates
+
+    def build(self) -> Callable[[Any], bool]:
+        fns = [p.compile() for p in self.predicates]
+        if len(fns) == 2:
+            first, second = fns
+            return lambda x: first(x) or second(x)
+        return lambda x: any(fn(x) for fn in fns)
+
+    def __or__(self, other: Predicate) -> Predicate:
+        return AnyOf(*self.predicates, other)
+
+
+HISTORY_MAGIC = b'NXH1\x00\x00\x00\x00'
+BLOCK_HEADER = struct.Struct('<BBHId')
+DATA_BLOCK = 0
+NAMES_BLOCK = 1
+ROW_TIMES = 1
+LITTLE_ENDIAN = sys.byteorder == 'little'
+
+
+def _padded(size: int) -> int:
+    return (size + 7) & ~7
+
+
+def _width(code: str) -> int:
+    return 4 if code == 'S' else 8
+
+
+class HistoryWriter:
+    def __init__(self, path: str, block_rows: int = 1) -> None:
+        self.path = path
+        self.block_rows = max(block_rows, 1)
+        self.codes: Dict[str, int] = {}
+        self.pending: List[List[Any]] = []
+        self.times: List[float] = []
+        self.file: BinaryIO
+        if os.path.exists(path) and os.path.getsize(path):
+            with HistoryReader(path) as reader:
+                self.codes = {name: i for i, name in enumerate(reader.names)}
+                end = reader.end
+            self.file = open(path, 'r+b')
+            self.file.truncate(end)
+            self.file.seek(end)
+        else:
+            self.file = open(path, 'wb')
+            self.file.write(HISTORY_MAGIC)
+
+    def __enter__(self) -> "HistoryWriter":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def append(self, columns: List[List[Any]], timestamp: float) -> None:
+        if self.block_rows == 1:
+            self._write_block(columns, timestamp, 0)
+            return
+        if self.pending and len(self.pending) != len(columns):
+            self._write_rows()
+        if not self.pending:
+            self.pending = [[] for _ in columns]
+        for buffered, column in zip(self.pending, columns):
+            buffered.extend(column)
+        self.times.extend([timestamp] * (len(columns[0]) if columns else 0))
+        if len(self.times) >= self.block_rows:
+            self._write_rows()
+
+    def _write_rows(self) -> None:
+        if self.times:
+            self._write_block(self.pending + [self.times], self.times[0],
+                              ROW_TIMES)
+        self.pending = []
+        self.times = []
+
+    def _write_block(self, columns: List[List[Any]], timestamp: float,
+                     flags: int) -> None:
+        encoded = [self._encode(column) for column in columns]
+        rows = len(encoded[0][1]) if encoded else 0
+        header = BLOCK_HEADER.pack(DATA_BLOCK, len(encoded), flags, rows,
+                                   timestamp)
+        typecodes = b''.join(code.encode() for code, _ in encoded)
+        self.file.write(header)
+        self.file.write(typecodes.ljust(_padded(len(typecodes)), b'\0'))
+        for _, values in encoded:
+            if not LITTLE_ENDIAN:
+                values.byteswap()
+            raw = values.tobytes()
+            self.file.write(raw.ljust(_padded(len(raw)), b'\0'))
+
+    def _encode(self, column: List[Any]) -> Tuple[str, array]:
+        if column and all(isinstance(v, str) for v in column):
+            fresh = [v for v in dict.fromkeys(column) if v not in self.codes]
+            if fresh:
+                self._write_names(fresh)
+            return 'S', array('I', map(self.codes.__getitem__, column))
+        if all(type(v) is int for v in column):
+            try:
+                return 'q', array('q', column)
+            except OverflowError:
+                pass
+        return 'd', array('d', column)
+
+    def _write_names(self, names: List[str]) -> None:
+        for name in names:
+            self.codes[name] = len(self.codes)
+        raw = '\0'.join(names).encode()
+        self.file.write(BLOCK_HEADER.pack(NAMES_BLOCK, 0, 0, len(raw), 0.0))
+        self.file.write(raw.ljust(_padded(len(raw)), b'\0'))
+
+    def flush(self) -> None:
+        self._write_rows()
+        self.file.flush()
+
+    def close(self) -> None:
+        self._write_rows()
+        self.file.close()
+
+
+class HistoryReader:
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.names: List[str] = []
+        self.blocks: List[Tuple[int, str, int, float, int]] = []
+        self.end = len(HISTORY_MAGIC)
+        self.truncated = False
+        self.views: List[memoryview] = []
+        self.file = open(path, 'rb')
+        self.mm = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.mm[:len(HISTORY_MAGIC)] != HISTORY_MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a stream history file")
+        self._scan()
+
+    def __enter__(self) -> "HistoryReader":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self.blocks)
+
+    def _scan(self) -> None:
+        offset = self.end
+        size = len(self.mm)
+        while offset + BLOCK_HEADER.size <= size:
+            kind, ncols, flags, rows, timestamp = \
+                BLOCK_HEADER.unpack_from(self.mm, offset)
+            body = offset + BLOCK_HEADER.size
+            if kind == NAMES_BLOCK:
+                following = body + _padded(rows)
+                if following > size:
+                    break
+                raw = self.mm[body:body + rows]
+                self.names.extend(raw.decode().split('\0'))
+            else:
+                start = body + _padded(ncols)
+                if start > size:
+                    break
+                typecodes = self.mm[body:body + ncols].decode()
+                following = start + sum(_padded(rows * _width(code))
+                                        for code in typecodes)
+                if following > size:
+                    break
+                self.blocks.append((start, typecodes, rows, timestamp,
+                                    flags))
+            offset = self.end = following
+        self.truncated = self.end != size
+
+    def timestamp(self, index: int) -> float:
+        return self.blocks[index][3]
+
+    def column(self, index: int,
+               position: int) -> Union["memoryview[Any]", array]:
+        view = self._view(index, position)
+        if isinstance(view, memoryview):
+            self.views.append(view)
+        return view
+
+    def _view(self, index: int,
+              position: int) -> Union["memoryview[Any]", array]:
+        offset, typecodes, rows, _, _ = self.blocks[index]
+        for code in typecodes[:position]:
+            offset += _padded(rows * _width(code))
+        code = typecodes[position]
+        raw = memoryview(self.mm)[offset:offset + rows * _width(code)]
+        if not LITTLE_ENDIAN:
+            values = array('I' if code == 'S' else code)
+            values.frombytes(raw)
+            values.byteswap()
+            raw.release()
+            return values
+        if code == 'S':
+            return raw.cast('I')
+        elif code == 'q':
+            return raw.cast('q')
+        return raw.cast('d')
+
+    def _decode(self, index: int, position: int) -> List[Any]:
+        view = self._view(index, position)
+        values: List[Any]
+        if self.blocks[index][1][position] == 'S':
+            names = self.names
+            values = [names[i] for i in view]
+        else:
+            values = view.tolist()
+        if isinstance(view, memoryview):
+            view.release()
+        return values
+
+    def columns(self, index: int) -> List[List[Any]]:
+        count = len(self.blocks[index][1])
+        if self.blocks[index][4] & ROW_TIMES:
+            count -= 1
+        return [self._decode(index, position) for position in range(count)]
+
+    def row_timestamps(self, index: int) -> List[float]:
+        _, typecodes, rows, timestamp, flags = self.blocks[index]
+        if flags & ROW_TIMES:
+            return self._decode(index, len(typecodes) - 1)
+        return [timestamp] * rows
+
+    def replay(self, stream: "DataStream", start: int = 0,
+               stop: Optional[int] = None, timed: bool = False) -> int:
+        count = 0
+        for index in range(*slice(start, stop).indices(len(self.blocks))):
+            columns = self.columns(index)
+            if self.blocks[index][4] & ROW_TIMES:
+                batches = [(timestamp, [[column[row]] for column in columns])
+                           for row, timestamp in
+                           enumerate(self.row_timestamps(index))]
+            else:
+                batches = [(self.timestamp(index), columns)]
+            for timestamp, batch_columns in batches:
+                data_batch = stream.from_columns(batch_columns)
+                if timed:
+                    stream.process_timed(timestamp, data_batch)
+                else:
+                    stream.process_batch(data_batch)
+                count += 1
+        return count
+
+    def close(self) -> None:
+        for view in self.views:
+            view.release()
+        self.views.clear()
+        self.mm.close()
+        self.file.close()
 
 
 class DataStream(ABC):
-    def __init__(self, name: str) -> None:
+    channels: Tuple[str, ...] = ()
+    mergeable = True
+    history_rows = 1
+
+    def __init__(self, name: str, alert_capacity: int = 1024) -> None:
         self.name = name
         self.count = 0
+        self.warn = AlertLog(alert_capacity)
+        self.windows: Dict[str, WindowAggregator] = {}
+        self.accept: Optional[Callable[[Any], bool]] = None
+        self.history: Optional[HistoryWriter] = None
+
+    separator = ''
 
     @abstractmethod
-    def process_batch(self, data_batch: List[Any]) -> str:
+    def update(self, data_batch: List[Any]) -> None:
         ...
 
-    def filter_data(self, data_batch: List[Any],
-                    criteria: Optional[str] = None) -> List[Any]:
+    @abstractmethod
+    def iter_records(self, data_batch: List[Any]) -> Iterator[str]:
         ...
 
-    def get_stats(self) -> Dict[str, Union[str, int, float]]:
-        ...
+    def set_filter(self, predicate: Optional[Predicate]) -> None:
+        self.accept = None if predicate is None else predicate.compile()
 
+    def select(self, data_batch: List[Any],
+               accept: Optional[Callable[[Any], bool]] = None) -> List[Any]:
+        accept = accept or self.accept
+        if accept is None:
+            return data_batch
+        return list(filter(accept, data_batch))
 
-class SensorStream(DataStream):
+    def record_history(self, path: Optional[str]) -> None:
+        if self.history is not None:
+            self.history.close()
+        self.history = None if path is None else \
+            HistoryWriter(path, self.history_rows)
 
-    def __init__(self, stream_id: str) -> None:
-        super().__init__(stream_id)
-        self.data = 0
-        self.warn = []
+    def to_columns(self, data_batch: List[Any]) -> List[List[Any]]:
+        return [data_batch]
+
+    def from_columns(self, columns: List[List[Any]]) -> List[Any]:
+        return columns[0]
+
+    def _accepted(self, data_batch: List[Any],
+                  timestamp: Optional[float] = None) -> List[Any]:
+        data_batch = self.select(data_batch)
+        if self.history is not None and data_batch:
+            if timestamp is None:
+                timestamp = time.time()
+            self.history.append(self.to_columns(data_batch), timestamp)
+        return data_batch
 
     def process_batch(self, data_batch: List[Any]) -> str:
-        self.count = len(data_batch)
-        self.data = data_batch[0]
-        result = ""
-        param = ['temp:', 'humidity:', 'pressure:']
-        if data_batch[0] > 50 or data_batch[0] < -10:
-            self.warn.append(f"extreme temperature: {data_batch[0]}")
-        if data_batch[1] < 20 or data_batch[1] > 80:
-            self.warn.append(f"extreme humidity rate: {data_batch[1]}")
-        for i, data in enumerate(data_batch):
-            result += f"{param[i]}"
-            result += f"{str(data)} "
-            i += 1
+        data_batch = self._accepted(data_batch)
+        self.update(data_batch)
+        return self.separator.join(self.iter_records(data_batch))
+
+    def add_window(self, name: str, size: float,
+                   slide: Optional[float] = None,
+                   channel: Optional[str] = None) -> WindowAggregator:
+        if channel is not None and channel not in self.channels:
+            raise ValueError(f"{self.name} has no channel {channel!r}")
+        window = self.windows[name] = WindowAggregator(size, slide, channel)
+        return window
+
+    def window_values(self, data_batch: List[Any],
+                      channel: Optional[str] = None) -> List[Any]:
+        return data_batch
+
+    def process_timed(self, timestamp: float, data_batch: List[Any]) -> str:
+        data_batch = self._accepted(data_batch, timestamp)
+        self.update(data_batch)
+        result = self.separator.join(self.iter_records(data_batch))
+        for window in self.windows.values():
+            for value in self.window_values(data_batch, window.channel):
+                window.add(timestamp, value)
         return result
 
+    def write_batch(self, data_batch: List[Any], sink: TextIO) -> None:
+        data_batch = self._accepted(data_batch)
+        self.update(data_batch)
+        records = self.iter_records(data_batch)
+        if not self.separator:
+            sink.writelines(records)
+            return
+        for record in records:
+            sink.write(record)
+            break
+        for record in records:
+            sink.write(self.separator)
+            sink.write(record)
+
     def filter_data(self, data_batch: List[Any],
-                    criteria: Optional[str] = None) -> List[Any]:
+                    criteria: Union[str, Predicate, None] = None
+                    ) -> List[Any]:
         if criteria == "hp":
-            return self.warn
+            return self.warn.last()
+        if isinstance(criteria, Predicate):
+            return self.select(data_batch, criteria.compile())
         return data_batch
 
     def get_stats(self) -> Dict[str, Union[str, int, float]]:
+        ...
+
+
+class P2Quantile:
+    __slots__ = ('p', 'heights', 'positions', 'desired', 'steps')
+
+    def __init__(self, p: float) -> None:
+        self.p = p
+        self.heights: List[float] = []
+        self.positions = [0, 1, 2, 3, 4]
+        self.desired = [0.0, 2 * p, 4 * p, 2 + 2 * p, 4.0]
+        self.steps = [0.0, p / 2, p, (1 + p) / 2, 1.0]
+
+    def add(self, value: float) -> None:
+        q = self.heights
+        if len(q) < 5:
+            insort(q, value)
+            return
+        if value < q[0]:
+            q[0] = value
+            k = 0
+        elif value >= q[4]:
+            q[4] = value
+            k = 3
+        else:
+            k = bisect_right(q, value) - 1
+        n = self.positions
+        for i in range(k + 1, 5):
+            n[i] += 1
+        desired = self.desired
+        for i, step in enumerate(self.steps):
+            desired[i] += step
+        for i in (1, 2, 3):
+            d = desired[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or \
+                    (d <= -1 and n[i - 1] - n[i] < -1):
+                s = 1 if d > 0 else -1
+                height = q[i] + s / (n[i + 1] - n[i - 1]) * (
+                    (n[i] - n[i - 1] + s) * (q[i + 1] - q[i])
+                    / (n[i + 1] - n[i])
+                    + (n[i + 1] - n[i] - s) * (q[i] - q[i - 1])
+                    / (n[i] - n[i - 1]))
+                if not q[i - 1] < height < q[i + 1]:
+                    height = q[i] + s * (q[i + s] - q[i]) / (n[i + s] - n[i])
+                q[i] = height
+                n[i] += s
+
+    @property
+    def count(self) -> int:
+        if len(self.heights) < 5:
+            return len(self.heights)
+        return self.positions[4] + 1
+
+    def value(self) -> float:
+        q = self.heights
+        if not q:
+            return 0.0
+        if len(q) < 5:
+            return q[min(int(self.p * len(q)), len(q) - 1)]
+        return q[2]
+
+
+class RunningStats:
+    __slots__ = ('count', 'mean', 'm2', 'low', 'high', 'ewma', 'alpha')
+
+    def __init__(self, alpha: float = 0.1) -> None:
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.low = 0.0
+        self.high = 0.0
+        self.ewma = 0.0
+        self.alpha = alpha
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        if self.count == 1:
+            self.low = self.high = self.ewma = value
+        else:
+            if value < self.low:
+                self.low = value
+            elif value > self.high:
+                self.high = value
+            self.ewma += self.alpha * (value - self.ewma)
+
+    @property
+    def variance(self) -> float:
+        return self.m2 / self.count if self.count else 0.0
+
+    def snapshot(self, prefix: str) -> Dict[str, Union[str, int, float]]:
         return {
+                f'{prefix}_count': self.count,
+                f'{prefix}_mean': self.mean,
+                f'{prefix}_var': self.variance,
+                f'{prefix}_min': self.low,
+                f'{prefix}_max': self.high,
+                f'{prefix}_ewma': self.ewma
+        }
+
+
+class SensorStream(DataStream):
+    channels = ('temp', 'humidity', 'pressure')
+    mergeable = False
+    history_rows = 256
+
+    def __init__(self, stream_id: str, alpha: float = 0.1) -> None:
+        super().__init__(stream_id)
+        self.data = 0.0
+        self.stats = {ch: RunningStats(alpha) for ch in self.channels}
+
+    def select(self, data_batch: List[Any],
+               accept: Optional[Callable[[Any], bool]] = None) -> List[Any]:
+        accept = accept or self.accept
+        if accept is None or accept(data_batch):
+            return data_batch
+        return []
+
+    def update(self, data_batch: List[Any]) -> None:
+        if not data_batch:
+            return
+        self.count += len(data_batch)
+        for channel, value in zip(self.channels, data_batch):
+            self.stats[channel].add(value)
+        self.data = self.stats['temp'].mean
+        if data_batch[0] > 50 or data_batch[0] < -10:
+            self.warn.add('temperature',
+                          f"extreme temperature: {data_batch[0]}")
+        if data_batch[1] < 20 or data_batch[1] > 80:
+            self.warn.add('humidity',
+                          f"extreme humidity rate: {data_batch[1]}")
+
+    def iter_records(self, data_batch: List[Any]) -> Iterator[str]:
+        for channel, data in zip(self.channels, data_batch):
+            yield f"{channel}:{data} "
+
+    def to_columns(self, data_batch: List[Any]) -> List[List[Any]]:
+        return [[value] for value in data_batch]
+
+    def from_columns(self, columns: List[List[Any]]) -> List[Any]:
+        return [column[0] for column in columns]
+
+    def window_values(self, data_batch: List[Any],
+                      channel: Optional[str] = None) -> List[Any]:
+        if not data_batch:
+            return []
+        return [data_batch[self.channels.index(channel or 'temp')]]
+
+    def get_stats(self) -> Dict[str, Union[str, int, float]]:
+        stats: Dict[str, Union[str, int, float]] = {
                 'nb': self.count,
                 'data': self.data,
                 'warn': len(self.warn)
         }
+        for channel, running in self.stats.items():
+            stats.update(running.snapshot(channel))
+        return stats
 
 
 class TransactionStream(DataStream):
+    extreme = 10000
+    min_samples = 100
 
-    def __init__(self, stream_id: str) -> None:
+    def __init__(self, stream_id: str, top: int = 10) -> None:
         super().__init__(stream_id)
         self.data = 0
-        self.warn = []
+        self.top = top
+        self.buys: List[Any] = []
+        self.sells: List[Any] = []
+        self.quantiles = {p: P2Quantile(p) for p in (0.5, 0.95, 0.99)}
 
-    def process_batch(self, data_batch: List[Any]) -> str:
+    def threshold(self) -> float:
+        p99 = self.quantiles[0.99]
+        if p99.count < self.min_samples:
+            return self.extreme
+        return p99.value()
+
+    def update(self, data_batch: List[Any]) -> None:
         self.count = len(data_batch)
         self.data = sum(data_batch)
+        limit = self.threshold()
 
-        result = ""
         for n in data_batch:
-            if n > 10000 or n < -10000:
-                self.warn.append("extreme transaction")
+            size = abs(n)
+            if size > limit:
+                self.warn.add('extreme', "extreme transaction")
+            for sketch in self.quantiles.values():
+                sketch.add(size)
             if n > 0:
-                result += 'buy:'
+                self._keep(self.buys, n)
             elif n < 0:
-                result += 'sell'
+                self._keep(self.sells, size)
             else:
-                self.warn.append("transaction can't be 0")
-            result += f"{n}"
-        return result
+                self.warn.add('zero', "transaction can't be 0")
 
-    def filter_data(self, data_batch: List[Any],
-                    criteria: Optional[str] = None) -> List[Any]:
-        if criteria == "hp":
-            return self.warn
-        return data_batch
+    def iter_records(self, data_batch: List[Any]) -> Iterator[str]:
+        for n in data_batch:
+            if n > 0:
+                yield f"buy:{n}"
+            elif n < 0:
+                yield f"sell{n}"
+            else:
+                yield f"{n}"
+
+    def _keep(self, heap: List[Any], value: Any) -> None:
+        if len(heap) < self.top:
+            heapq.heappush(heap, value)
+        elif value > heap[0]:
+            heapq.heapreplace(heap, value)
+
+    def top_buys(self) -> List[Any]:
+        return sorted(self.buys, reverse=True)
+
+    def top_sells(self) -> List[Any]:
+        return [-n for n in sorted(self.sells, reverse=True)]
 
     def get_stats(self) -> Dict[str, Union[str, int, float]]:
         return {
                 'nb': self.count,
                 'data': self.data,
-                'warn': len(self.warn)
+                'warn': len(self.warn),
+                'p50': self.quantiles[0.5].value(),
+                'p95': self.quantiles[0.95].value(),
+                'p99': self.quantiles[0.99].value(),
+                'threshold': self.threshold(),
+                'max_buy': max(self.buys, default=0),
+                'max_sell': -max(self.sells, default=0)
         }
 
 
 class EventStream(DataStream):
+    separator = ' '
+
     def __init__(self, stream_id: str) -> None:
         super().__init__(stream_id)
         self.data = 0
-        self.warn = []
 
-    def process_batch(self, data_batch: List[Any]) -> str:
+    def update(self, data_batch: List[Any]) -> None:
         self.count = len(data_batch)
-
-        result = ""
         for e in data_batch:
-            result += f"{e},"
-            if e != data_batch[-1]:
-                result += ' '
             if e == 'error':
-                self.warn.append("error detected")
-            self.data = len(self.warn)
-        return result
+                self.warn.add('error', "error detected")
+        self.data = len(self.warn)
+
+    def iter_records(self, data_batch: List[Any]) -> Iterator[str]:
+        for e in data_batch:
+            yield f"{e},"
 
     def get_stats(self) -> Dict[str, Union[str, int, float]]:
         return {
@@ -136,16 +939,201 @@ class StreamProcessor:
     def process_batch(self, data_batch: List[Any]) -> str:
         return self.type.process_batch(data_batch)
 
+    def write_batch(self, data_batch: List[Any], sink: TextIO) -> None:
+        self.type.write_batch(data_batch, sink)
+
+    def set_filter(self, predicate: Optional[Predicate]) -> None:
+        self.type.set_filter(predicate)
+
     def filter_data(self, data_batch: List[Any],
-                    criteria: Optional[str] = None) -> List[Any]:
-        if criteria == 'hp':
-            data_batch = self.type.filter_data(data_batch, 'hp')
-        return data_batch
+                    criteria: Union[str, Predicate, None] = None
+                    ) -> List[Any]:
+        return self.type.filter_data(data_batch, criteria)
 
     def get_stats(self) -> Dict[str, Union[str, int, float]]:
         return self.type.get_stats()
 
 
+_DONE = object()
+
+
+class AsyncStreamProcessor:
+    def __init__(self, queue_size: int = 1024, batch_size: int = 256,
+                 sink: Optional[TextIO] = None) -> None:
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.sink = sink
+        self.processors: Dict[str, StreamProcessor] = {}
+
+    async def run(self, sources: Dict[str, AsyncIterator[Any]]
+                  ) -> Dict[str, int]:
+        delivered = dict.fromkeys(sources, 0)
+        tasks: List[asyncio.Task] = []
+        for stream_id, source in sources.items():
+            processor = self.processors.get(stream_id)
+            if processor is None:
+                processor = self.processors[stream_id] = \
+                    StreamProcessor(stream_id)
+            queue: asyncio.Queue = asyncio.Queue(self.queue_size)
+            tasks.append(asyncio.create_task(self._produce(source, queue)))
+            tasks.append(asyncio.create_task(
+                self._consume(stream_id, processor, queue, delivered)))
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        return delivered
+
+    async def _produce(self, source: AsyncIterator[Any],
+                       queue: asyncio.Queue) -> None:
+        async for record in source:
+            await queue.put(record)
+        await queue.put(_DONE)
+
+    async def _consume(self, stream_id: str, processor: StreamProcessor,
+                       queue: asyncio.Queue, delivered: Dict[str, int]
+                       ) -> None:
+        done = False
+        while not done:
+            records = [await queue.get()]
+            while len(records) < self.batch_size and not queue.empty():
+                records.append(queue.get_nowait())
+            if records[-1] is _DONE:
+                records.pop()
+                done = True
+            if records:
+                self._dispatch(processor, records)
+                delivered[stream_id] += len(records)
+            await asyncio.sleep(0)
+
+    def _dispatch(self, processor: StreamProcessor,
+                  records: List[Any]) -> None:
+        batches = [records] if processor.type.mergeable else records
+        for batch in batches:
+            if self.sink is None:
+                processor.process_batch(batch)
+            else:
+                processor.write_batch(batch, self.sink)
+
+
+def _fleet_worker(inbox: Any, outbox: Any) -> None:
+    streams: Dict[str, StreamProcessor] = {}
+    errors: Dict[str, int] = {}
+    while True:
+        op, payload = inbox.get()
+        if op == 'batches':
+            for stream_id, batch in payload:
+                try:
+                    processor = streams.get(stream_id)
+                    if processor is None:
+                        processor = streams[stream_id] = \
+                            StreamProcessor(stream_id)
+                    processor.process_batch(batch)
+                except Exception:
+                    errors[stream_id] = errors.get(stream_id, 0) + 1
+        elif op == 'stats':
+            snapshot: Dict[str, Dict[str, Union[str, int, float]]] = {}
+            for stream_id, processor in streams.items():
+                stats = processor.get_stats()
+                stats['errors'] = errors.get(stream_id, 0)
+                snapshot[stream_id] = stats
+            for stream_id, count in errors.items():
+                if stream_id not in streams:
+                    snapshot[stream_id] = {'errors': count}
+            outbox.put((payload, snapshot))
+        else:
+            break
+
+
+class StreamFleet:
+    def __init__(self, workers: Optional[int] = None,
+                 timeout: float = 10.0) -> None:
+        self.size = workers or os.cpu_count() or 1
+        self.timeout = timeout
+        self.requests = 0
+        self.outbox: Any = multiprocessing.Queue()
+        self.inboxes: List[Any] = []
+        self.workers: List[multiprocessing.Process] = []
+        for _ in range(self.size):
+            inbox: Any = multiprocessing.Queue()
+            worker = multiprocessing.Process(target=_fleet_worker,
+                                             args=(inbox, self.outbox),
+                                             daemon=True)
+            worker.start()
+            self.inboxes.append(inbox)
+            self.workers.append(worker)
+
+    def __enter__(self) -> "StreamFleet":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def shard(self, stream_id: str) -> int:
+        return zlib.crc32(stream_id.encode()) % self.size
+
+    def _check(self) -> None:
+        if not self.workers:
+            raise RuntimeError("stream fleet is closed")
+        dead = sum(not worker.is_alive() for worker in self.workers)
+        if dead:
+            raise RuntimeError(f"{dead} stream fleet worker(s) died")
+
+    def submit(self, stream_id: str, data_batch: List[Any]) -> None:
+        self._check()
+        self.inboxes[self.shard(stream_id)].put(
+            ('batches', [(stream_id, data_batch)]))
+
+    def submit_many(self, batches: Iterable[Tuple[str, List[Any]]]) -> None:
+        self._check()
+        routed: List[List[Tuple[str, List[Any]]]] = \
+            [[] for _ in range(self.size)]
+        for stream_id, data_batch in batches:
+            routed[self.shard(stream_id)].append((stream_id, data_batch))
+        for inbox, payload in zip(self.inboxes, routed):
+            if payload:
+                inbox.put(('batches', payload))
+
+    def get_stats(self) -> Dict[str, Dict[str, Union[str, int, float]]]:
+        self._check()
+        self.requests += 1
+        for inbox in self.inboxes:
+            inbox.put(('stats', self.requests))
+        merged: Dict[str, Dict[str, Union[str, int, float]]] = {}
+        pending = len(self.inboxes)
+        deadline = time.monotonic() + self.timeout
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError("stream fleet did not report stats in "
+                                   f"{self.timeout}s")
+            try:
+                request, snapshot = self.outbox.get(
+                    timeout=min(remaining, 0.1))
+            except queue.Empty:
+                self._check()
+                continue
+            if request == self.requests:
+                merged.update(snapshot)
+                pending -= 1
+        return merged
+
+    def close(self) -> None:
+        for inbox, worker in zip(self.inboxes, self.workers):
+            if worker.is_alive():
+                inbox.put(('stop', None))
+        deadline = time.monotonic() + self.timeout
+        for worker in self.workers:
+            worker.join(max(deadline - time.monotonic(), 0))
+            if worker.is_alive():
+                worker.terminate()
+                worker.join()
+        self.inboxes.clear()
+        self.workers.clear()
+
+
 def ft_data_stream() -> None:
     print("=== CODE NEXUS - POLYMORPHIC STREAM SYSTEM ===\n")
 
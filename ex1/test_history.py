@@ -0,0 +1,108 @@
+import os
+import tempfile
+import unittest
+
+from data_stream import (EventStream, HistoryReader, HistoryWriter,
+                         SensorStream, TransactionStream)
+
+
+class HistoryTest(unittest.TestCase):
+    def setUp(self) -> None:
+        fd, self.path = tempfile.mkstemp(suffix='.nxh')
+        os.close(fd)
+        os.unlink(self.path)
+
+    def tearDown(self) -> None:
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    def test_round_trip(self) -> None:
+        with HistoryWriter(self.path) as writer:
+            writer.append([[1, -2, 3]], 10.0)
+            writer.append([[0.5, 1.5]], 11.0)
+            writer.append([['login', 'error', 'login']], 12.0)
+        with HistoryReader(self.path) as reader:
+            self.assertEqual(len(reader), 3)
+            self.assertFalse(reader.truncated)
+            self.assertEqual(reader.columns(0), [[1, -2, 3]])
+            self.assertEqual(reader.columns(1), [[0.5, 1.5]])
+            self.assertEqual(reader.columns(2), [['login', 'error', 'login']])
+            self.assertEqual(reader.timestamp(2), 12.0)
+
+    def test_replay_restores_stream_state(self) -> None:
+        stream = TransactionStream("TRANS_A")
+        stream.record_history(self.path)
+        for batch in ([100, -150, 75], [20000, -5]):
+            stream.process_batch(batch)
+        stream.record_history(None)
+        replayed = TransactionStream("TRANS_B")
+        with HistoryReader(self.path) as reader:
+            self.assertEqual(reader.replay(replayed), 2)
+        self.assertEqual(replayed.get_stats(), stream.get_stats())
+
+    def test_sensor_rows_share_blocks(self) -> None:
+        stream = SensorStream("SENSOR_A")
+        stream.record_history(self.path)
+        for i in range(300):
+            stream.process_timed(float(i), [20 + i % 5, 50, 1013])
+        stream.record_history(None)
+        replayed = SensorStream("SENSOR_B")
+        with HistoryReader(self.path) as reader:
+            self.assertEqual(len(reader), 2)
+            self.assertEqual(reader.row_timestamps(1)[0], 256.0)
+            self.assertEqual(reader.replay(replayed, timed=True), 300)
+        self.assertEqual(replayed.get_stats(), stream.get_stats())
+
+    def test_reopen_appends_and_keeps_names(self) -> None:
+        stream = EventStream("EVENT_A")
+        stream.record_history(self.path)
+        stream.process_batch(['login', 'error'])
+        stream.record_history(None)
+        stream.record_history(self.path)
+        stream.process_batch(['error', 'logout'])
+        stream.record_history(None)
+        with HistoryReader(self.path) as reader:
+            self.assertEqual([reader.columns(i) for i in range(len(reader))],
+                             [[['login', 'error']], [['error', 'logout']]])
+            self.assertEqual(reader.names, ['login', 'error', 'logout'])
+
+    def test_truncated_block_is_dropped_on_reopen(self) -> None:
+        with HistoryWriter(self.path) as writer:
+            writer.append([[1, 2, 3]], 1.0)
+            writer.append([[4, 5, 6]], 2.0)
+        with open(self.path, 'r+b') as f:
+            f.truncate(os.path.getsize(self.path) - 4)
+        with HistoryReader(self.path) as reader:
+            self.assertTrue(reader.truncated)
+            self.assertEqual(len(reader), 1)
+        with HistoryWriter(self.path) as writer:
+            writer.append([[7]], 3.0)
+        with HistoryReader(self.path) as reader:
+            self.assertFalse(reader.truncated)
+            self.assertEqual([reader.columns(i) for i in range(len(reader))],
+                             [[[1, 2, 3]], [[7]]])
+
+    def test_large_ints_fall_back_to_floats(self) -> None:
+        with HistoryWriter(self.path) as writer:
+            writer.append([[1, 2 ** 70]], 1.0)
+        with HistoryReader(self.path) as reader:
+            self.assertEqual(reader.columns(0), [[1.0, float(2 ** 70)]])
+
+    def test_close_releases_column_views(self) -> None:
+        with HistoryWriter(self.path) as writer:
+            writer.append([[1, 2, 3]], 1.0)
+        with HistoryReader(self.path) as reader:
+            view = reader.column(0, 0)
+            self.assertEqual(view.tolist(), [1, 2, 3])
+        with self.assertRaises(ValueError):
+            view.tolist()
+
+    def test_rejects_foreign_files(self) -> None:
+        with open(self.path, 'wb') as f:
+            f.write(b'not a history file')
+        with self.assertRaises(ValueError):
+            HistoryReader(self.path)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+import unittest
+
+from data_stream import EventStream, SensorStream, WindowAggregator
+
+
+def closed(window: WindowAggregator) -> list:
+    return [(round(w.start, 6), w.count, w.total, w.low, w.high)
+            for w in window.results]
+
+
+class WindowTest(unittest.TestCase):
+    def test_tumbling(self) -> None:
+        window = WindowAggregator(10)
+        for ts, value in ((0, 1), (5, 3), (12, 7), (25, 2)):
+            window.add(ts, value)
+        window.flush()
+        self.assertEqual(closed(window), [(0, 2, 4, 1, 3), (10, 1, 7, 7, 7),
+                                          (20, 1, 2, 2, 2)])
+
+    def test_sliding(self) -> None:
+        window = WindowAggregator(4, 2)
+        for ts, value in ((0, 1), (2, 2), (4, 3), (6, 4)):
+            window.add(ts, value)
+        window.flush()
+        self.assertEqual(closed(window)[1:4], [(0, 2, 3, 1, 2),
+                                               (2, 2, 5, 2, 3),
+                                               (4, 2, 7, 3, 4)])
+
+    def test_float_slide(self) -> None:
+        window = WindowAggregator(0.3, 0.1)
+        for i in range(6):
+            window.add(i * 0.1, i)
+        window.flush()
+        counts = {start: count for start, count, _, _, _ in closed(window)}
+        self.assertEqual(counts[0.0], 3)
+        self.assertEqual(counts[0.3], 3)
+
+    def test_size_must_be_multiple_of_slide(self) -> None:
+        with self.assertRaises(ValueError):
+            WindowAggregator(10, 3)
+
+    def test_late_and_out_of_order_values(self) -> None:
+        window = WindowAggregator(4, 2)
+        window.add(4, 10)
+        window.add(3, 5)
+        window.add(20, 1)
+        window.add(1, 99)
+        window.flush()
+        self.assertEqual(window.late, 1)
+        self.assertIn((2, 2, 15, 5, 10), closed(window))
+
+    def test_gaps_skip_empty_windows(self) -> None:
+        window = WindowAggregator(2, 1)
+        window.add(0, 1)
+        window.add(100, 2)
+        window.flush()
+        self.assertTrue(all(count for _, count, _, _, _ in closed(window)))
+
+    def test_stream_channels(self) -> None:
+        stream = SensorStream("SENSOR_W")
+        stream.add_window('hum', 10, channel='humidity')
+        stream.process_timed(0, [20, 55, 1013])
+        stream.process_timed(3, [21, 65, 1013])
+        self.assertEqual(stream.windows['hum'].current().avg, 60)
+        with self.assertRaises(ValueError):
+            stream.add_window('bad', 10, channel='wind')
+        with self.assertRaises(ValueError):
+            EventStream("EVENT_W").add_window('bad', 10, channel='temp')
+
+
+if __name__ == "__main__":
+    unittest.main()
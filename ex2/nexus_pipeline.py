@@ -1,7 +1,19 @@
 #!/usr/bin/env pyhton3
 from abc import ABC, abstractmethod
-from typing import Any, List, Dict, Union, Protocol
+from array import array
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import (Any, List, Dict, Union, Protocol, Callable, Optional,
+                    NamedTuple, Set, Tuple, Iterable, Iterator)
 from datetime import datetime
+from enum import Enum
+from functools import lru_cache
+from graphlib import TopologicalSorter
+import csv
+import json
+import queue
+import random
+import threading
 import time
 
 
@@ -10,158 +22,689 @@ class ProcessingStage(Protocol):
         ...
 
 
+class Format(Enum):
+    INVALID = 0
+    JSON = 1
+    CSV = 2
+    STREAM = 3
+
+
+class Record(NamedTuple):
+    format: Format = Format.INVALID
+    data: Any = None
+    validation: bool = False
+    stage: int = 1
+    error: str = ""
+
+
+DAYS_IN_MONTH = (0, 31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+
+
+@lru_cache(maxsize=65536)
+def valid_timestamp(text: str) -> bool:
+    if len(text) == 19 and text[4] == '-' and text[7] == '-' and \
+            text[10] == ' ' and text[13] == ':' and text[16] == ':':
+        digits = (text[0:4] + text[5:7] + text[8:10]
+                  + text[11:13] + text[14:16] + text[17:19])
+        if digits.isascii() and digits.isdigit():
+            year, month, day = int(text[0:4]), int(text[5:7]), int(text[8:10])
+            if year == 0 or not 1 <= month <= 12 or \
+                    not 1 <= day <= DAYS_IN_MONTH[month]:
+                return False
+            if month == 2 and day == 29 and \
+                    (year % 4 or (year % 100 == 0 and year % 400)):
+                return False
+            return int(text[11:13]) < 24 and int(text[14:16]) < 60 and \
+                int(text[17:19]) < 60
+    try:
+        datetime.strptime(text, "%Y-%m-%d %H:%M:%S")
+    except ValueError:
+        return False
+    return True
+
+
+def validate_timestamps(column: Iterable[str]) -> List[bool]:
+    return list(map(valid_timestamp, column))
+
+
+def as_buffer(data: Any) -> Optional[array]:
+    if isinstance(data, array) and data.typecode == 'd':
+        return data
+    try:
+        return array('d', data)
+    except (TypeError, OverflowError):
+        return None
+
+
+def valid_reading(reading: Dict) -> bool:
+    return reading.get('sensor') == 'temp' and 'unit' in reading and \
+        isinstance(reading.get('value'), (int, float))
+
+
+def split_csv(line: str) -> List[str]:
+    if '"' not in line:
+        return line.split(',')
+    return next(csv.reader([line]))
+
+
 class InputStage():
-    def process(self, data: Any) -> Dict:
-        dico = {}
+    def process(self, data: Any) -> Record:
+        if isinstance(data, Record):
+            return data
 
-        if isinstance(data, Dict):
-            dico.update({'type': 'JSON'})
-            dico.update({'data': data})
-            dico.update({'validation': True})
-            dico.update({'stage': 'Stage 1'})
+        elif isinstance(data, Dict):
+            return Record(Format.JSON, data, True)
 
         elif isinstance(data, str) and ',' in data:
-            dico.update({'type': 'CSV'})
-            dico.update({'validation': True})
-            try:
-                dico.update({'data': data.split(',')})
-            except Exception:
-                dico['validation'] = False
-            dico.update({'stage': 'Stage 1'})
+            return Record(Format.CSV, split_csv(data), True)
 
-        elif isinstance(data, List):
-            dico.update({'type': 'Stream'})
-            dico.update({'data': data})
-            dico.update({'validation': True})
-            dico.update({'stage': 'Stage 1'})
+        elif isinstance(data, (List, array)):
+            return Record(Format.STREAM, data, True)
 
-        else:
-            dico.update({'validation': False})
-            dico.update({'error': "Invalid type input"})
-            dico.update({'stage': 'Stage 1'})
-
-        return dico
+        return Record(error="Invalid type input")
 
 
 class TransformStage():
-    def process(self, data: Any) -> Dict:
-
-        if data['type'] == 'JSON' and data['validation'] is True:
-            if data['data']['sensor'] == 'temp' and \
-                    isinstance(data['data']['value'], (int, float)):
-                data['data']['sensor'] = 'temperature'
-                if data['data']['value'] > 40 or data['data']['value'] < 0:
-                    data['data'].update({'range': 'Extreme'})
+    def process(self, data: Record) -> Record:
+        if data.validation is False:
+            return data
+
+        if data.format is Format.JSON:
+            reading = data.data
+            if valid_reading(reading):
+                value = reading['value']
+                enriched = dict(reading)
+                enriched['sensor'] = 'temperature'
+                if value > 40 or value < 0:
+                    enriched['range'] = 'Extreme'
                 else:
-                    data['data'].update({'range': 'Normal'})
-            else:
-                data.update({'error': "Invalid data format"})
-                data['validation'] = False
-            data['stage'] = 'Stage 2'
-
-        elif data['type'] == 'CSV' and data['validation'] is True:
-            action = data['data'][1]
-            date = data['data'][2]
-            try:
-                if datetime.strptime(date, "%Y-%m-%d %H:%M:%S") and \
-                        (action.isidentifier() and action.islower()):
-                    data['validation'] = True
-            except ValueError:
-                data['validation'] = False
-                data.update({'error': "Invalid data format"})
-            data['stage'] = 'Stage 2'
-
-        elif data['type'] == 'Stream' and data['validation'] is True:
-            count = 0
-            for t in data['data']:
-                count += 1
-                if isinstance(t, (int, float)) is False:
-                    data['validation'] = False
-            if data['validation'] is True:
-                new_dict = {}
-                new_dict.update({'avg': sum(data['data']) / count})
-                new_dict.update({'count': count})
-                data['data'] = new_dict
-            else:
-                data.update({'error': "Invalid data format"})
-            data['stage'] = 'Stage 2'
+                    enriched['range'] = 'Normal'
+                return Record(Format.JSON, enriched, True, 2)
+            return Record(Format.JSON, reading, False, 2,
+                          "Invalid data format")
+
+        elif data.format is Format.CSV:
+            fields = data.data
+            if len(fields) < 3 or not valid_timestamp(fields[2]):
+                return Record(Format.CSV, fields, False, 2,
+                              "Invalid data format")
+            return Record(Format.CSV, fields, True, 2)
+
+        elif data.format is Format.STREAM:
+            buffer = as_buffer(data.data)
+            if not buffer:
+                return Record(Format.STREAM, data.data, False, 2,
+                              "Invalid data format")
+            count = len(buffer)
+            return Record(Format.STREAM, (count, sum(buffer) / count), True,
+                          2)
 
         return data
 
 
 class OutputStage():
 
-    def process(self, data: Any) -> str:
-        if data['type'] == 'JSON' and data['validation'] is True:
-            data['stage'] = 'Stage 3'
-            res = f"Processed {data['data']['sensor']} "
-            res += f"reading: {data['data']['value']}°{data['data']['unit']} "
-            res += f"({data['data']['range']} range)"
-            return res
+    def process(self, data: Record) -> str:
+        if data.validation is False:
+            return f"Error detected in Stage {data.stage}: {data.error}"
 
-        elif data['type'] == 'CSV' and data['validation'] is True:
-            data['stage'] = 'Stage 3'
-            res = "User activity logged: 1 action processed"
+        if data.format is Format.JSON:
+            res = f"Processed {data.data['sensor']} "
+            res += f"reading: {data.data['value']}°{data.data['unit']} "
+            res += f"({data.data['range']} range)"
             return res
 
-        elif data['type'] == 'Stream' and data['validation'] is True:
-            data['stage'] = 'Stage 3'
-            res = f"Stream summary: {data['data']['count']} readings, "
-            res += f"avg: {data['data']['avg']}°C"
-            return res
+        elif data.format is Format.CSV:
+            return "User activity logged: 1 action processed"
+
+        count, avg = data.data
+        return f"Stream summary: {count} readings, avg: {avg}°C"
 
+
+def _fused_json(data: Dict) -> str:
+    if valid_reading(data):
+        value = data['value']
+        if value > 40 or value < 0:
+            level = 'Extreme'
         else:
-            return f"Error detected in {data['stage']}: {data['error']}"
+            level = 'Normal'
+        return (f"Processed temperature reading: {value}°{data['unit']} "
+                f"({level} range)")
+    return "Error detected in Stage 2: Invalid data format"
+
+
+def _fused_csv(data: str) -> str:
+    if ',' not in data:
+        return "Error detected in Stage 1: Invalid type input"
+    return fused_csv_row(split_csv(data))
+
+
+def fused_csv_row(fields: List[str]) -> str:
+    if len(fields) < 3 or not valid_timestamp(fields[2]):
+        return "Error detected in Stage 2: Invalid data format"
+    return "User activity logged: 1 action processed"
+
+
+def _fused_stream(data: Union[List, array]) -> str:
+    buffer = as_buffer(data)
+    if not buffer:
+        return "Error detected in Stage 2: Invalid data format"
+    count = len(buffer)
+    return f"Stream summary: {count} readings, avg: {sum(buffer) / count}°C"
+
+
+def _fused_record(data: Record) -> str:
+    if data.validation is False:
+        return f"Error detected in Stage {data.stage}: {data.error}"
+    if data.format is Format.JSON:
+        return _fused_json(data.data)
+    elif data.format is Format.CSV:
+        return fused_csv_row(data.data)
+    return _fused_stream(data.data)
+
+
+FUSED: Dict[type, Callable[[Any], str]] = {
+    dict: _fused_json,
+    str: _fused_csv,
+    list: _fused_stream,
+    array: _fused_stream,
+    Record: _fused_record,
+}
+
+
+def fused_process(data: Any) -> str:
+    fn = FUSED.get(type(data))
+    if fn is not None:
+        return fn(data)
+    if isinstance(data, Dict):
+        return _fused_json(data)
+    elif isinstance(data, str):
+        return _fused_csv(data)
+    elif isinstance(data, (List, array)):
+        return _fused_stream(data)
+    return "Error detected in Stage 1: Invalid type input"
+
+
+def fuse(stages: List[ProcessingStage]) -> Optional[Callable[[Any], str]]:
+    kinds = [type(s) for s in stages]
+    if kinds == [InputStage, TransformStage, OutputStage]:
+        return fused_process
+    return None
+
+
+def record_key(data: Any) -> Any:
+    if isinstance(data, Record):
+        return (Record, data.format, data.validation, data.stage,
+                data.error, record_key(data.data))
+    if isinstance(data, dict):
+        return (dict, tuple((k, type(v), v) for k, v in data.items()))
+    if isinstance(data, list):
+        return (list, tuple(map(type, data)), tuple(data))
+    return (type(data), data)
+
+
+class RecordCache:
+    def __init__(self, maxsize: int = 1024) -> None:
+        self.maxsize = maxsize
+        self.entries: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def wrap(self, fn: Callable[[Any], Any]) -> Callable[[Any], Any]:
+        entries = self.entries
+
+        def cached(data: Any) -> Any:
+            try:
+                key = record_key(data)
+                result = entries.get(key, entries)
+            except TypeError:
+                return fn(data)
+            if result is not entries:
+                entries.move_to_end(key)
+                self.hits += 1
+                return result
+            self.misses += 1
+            result = entries[key] = fn(data)
+            if len(entries) > self.maxsize:
+                entries.popitem(last=False)
+            return result
+        return cached
+
+    def clear(self) -> None:
+        self.entries.clear()
+
+
+class StageMetrics:
+    __slots__ = ('calls', 'errors', 'rejected', 'buckets')
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.errors = 0
+        self.rejected = 0
+        self.buckets = [0] * 64
+
+    def observe(self, elapsed_ns: int) -> None:
+        self.calls += 1
+        self.buckets[min(elapsed_ns.bit_length(), 63)] += 1
+
+    def percentile(self, q: float) -> float:
+        target = q * self.calls
+        seen = 0
+        for bucket, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= target:
+                return (1 << bucket) / 1000
+        return 0.0
+
+    def snapshot(self) -> Dict[str, Union[int, float]]:
+        return {
+            'samples': self.calls,
+            'errors': self.errors,
+            'sampled_rejected': self.rejected,
+            'p50_us': self.percentile(0.5),
+            'p99_us': self.percentile(0.99)
+        }
+
+
+def _clock_overhead(clock: Callable[[], int] = time.perf_counter_ns,
+                    rounds: int = 1000) -> int:
+    return min(-clock() + clock() for _ in range(rounds))
+
+
+class PipelineMetrics:
+    probe_rate = 0.125
+    clock_ns = _clock_overhead()
+
+    def __init__(self, sample_every: int = 256) -> None:
+        self.sample_every = max(sample_every, 1)
+        self.counted = 0
+        self.gap = self.countdown = self._gap()
+        self.probes = 0
+        self.errors = 0
+        self.busy_ns = 0
+        self.timed = 0
+        self.stages: Dict[str, StageMetrics] = {}
+        self.total = StageMetrics()
+        self.failed: Callable[[Any], None] = self._count_error
+
+    @property
+    def records(self) -> int:
+        return self.counted + self.gap - self.countdown
+
+    def _gap(self) -> int:
+        return random.randint(1, 2 * self.sample_every - 1)
+
+    def _resample(self) -> None:
+        self.counted += self.gap
+        self.gap = self.countdown = self._gap()
+
+    def _count_error(self, data: Any) -> None:
+        self.errors += 1
+        self.total.errors += 1
+
+    def instrument(self, run: Callable[[Any], Any],
+                   stages: List[ProcessingStage]) -> Callable[[Any], Any]:
+        named = [(f"{i + 1}:{type(s).__name__}", s)
+                 for i, s in enumerate(stages)]
+        for name, _ in named:
+            self.stages.setdefault(name, StageMetrics())
+        timed = [(self.stages[name], s) for name, s in named]
+        clock = time.perf_counter_ns
+
+        def staged(data: Any) -> Any:
+            for metrics, stage in timed:
+                valid = not isinstance(data, Record) or data.validation
+                begin = clock()
+                try:
+                    data = stage.process(data)
+                except Exception:
+                    metrics.errors += 1
+                    raise
+                finally:
+                    metrics.observe(clock() - begin)
+                if valid and isinstance(data, Record) and not data.validation:
+                    metrics.rejected += 1
+            return data
+
+        def failed(data: Any) -> None:
+            self._count_error(data)
+            for metrics, stage in timed:
+                try:
+                    data = stage.process(data)
+                except Exception:
+                    metrics.errors += 1
+                    return
+
+        def instrumented(data: Any) -> Any:
+            self.countdown -= 1
+            if self.countdown:
+                try:
+                    return run(data)
+                except Exception:
+                    failed(data)
+                    raise
+            self._resample()
+            if timed and random.random() < self.probe_rate:
+                self.probes += 1
+                try:
+                    return staged(data)
+                except Exception:
+                    self._count_error(data)
+                    raise
+            start = clock()
+            try:
+                return run(data)
+            except Exception:
+                failed(data)
+                raise
+            finally:
+                elapsed = max(clock() - start - self.clock_ns, 0)
+                self.busy_ns += elapsed
+                self.timed += 1
+                self.total.observe(elapsed)
+
+        self.failed = failed
+        return instrumented
+
+    def run_batch(self, records: List[Any], fast: Callable[[Any], Any],
+                  sampled: Callable[[Any], Any]) -> List[Any]:
+        clock = time.perf_counter_ns
+        results: List[Any] = []
+        i, n = 0, len(records)
+        while i < n:
+            chunk = records[i:i + self.countdown - 1]
+            done = len(results)
+            start = clock()
+            try:
+                results.extend(map(fast, chunk))
+            except Exception:
+                self.countdown -= len(results) - done + 1
+                self.failed(records[i + len(results) - done])
+                raise
+            finally:
+                self.busy_ns += clock() - start
+                self.timed += len(results) - done
+            self.countdown -= len(chunk)
+            i += len(chunk)
+            if i < n:
+                results.append(sampled(records[i]))
+                i += 1
+        return results
+
+    def snapshot(self) -> Dict[str, Any]:
+        records = self.records
+        timed = self.timed
+        busy = self.busy_ns / 1e9 * records / timed if timed else 0.0
+        return {
+            'records': records,
+            'errors': self.errors,
+            'busy': busy,
+            'throughput': records / busy if busy else 0.0,
+            'sample_every': self.sample_every,
+            'probes': self.probes,
+            'total': self.total.snapshot(),
+            'stages': {name: m.snapshot() for name, m in self.stages.items()}
+        }
+
+
+class MetricsExporter:
+    def __init__(self, source: Callable[[], Dict[str, Any]],
+                 interval: float = 10.0,
+                 sink: Optional[Callable[[Dict[str, Any]], None]] = None
+                 ) -> None:
+        self.source = source
+        self.interval = interval
+        self.sink = sink or (lambda snapshot: print(json.dumps(snapshot)))
+        self.stopped = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self) -> None:
+        while not self.stopped.wait(self.interval):
+            self.sink(self.source())
+
+    def stop(self) -> None:
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+
+class StageFailure:
+    __slots__ = ('error',)
+
+    def __init__(self, error: Exception) -> None:
+        self.error = error
+
+
+_DONE = object()
 
 
 class ProcessingPipeline(ABC):
+    id: str
+    accepts: Tuple[type, ...] = (object,)
+
     def __init__(self) -> None:
-        self.stages = []
+        self.stages: List[ProcessingStage] = []
+        self.compiled: Optional[Callable[[Any], Any]] = None
+        self.plain: Optional[Callable[[Any], Any]] = None
+        self.cache: Optional[RecordCache] = None
+        self.metrics: Optional[PipelineMetrics] = None
+
+    def enable_metrics(self, sample_every: int = 256) -> PipelineMetrics:
+        self.metrics = PipelineMetrics(sample_every)
+        self.compiled = None
+        return self.metrics
+
+    def enable_cache(self, maxsize: int = 1024) -> None:
+        self.cache = RecordCache(maxsize)
+        self.compiled = None
 
     def add_stage(self, stage: ProcessingStage) -> None:
         self.stages.append(stage)
+        self.compiled = None
 
     @abstractmethod
     def process(self, data: Any) -> Union[str, Any]:
         ...
 
+    def compile(self) -> Callable[[Any], Any]:
+        if self.compiled is None:
+            run = fuse(self.stages) or self.process
+            if self.cache is not None:
+                self.cache.clear()
+                run = self.cache.wrap(run)
+            self.plain = run
+            if self.metrics is not None:
+                run = self.metrics.instrument(run, self.stages)
+            self.compiled = run
+        return self.compiled
+
+    def process_batch(self, records: List[Any]) -> List[Any]:
+        run = self.compile()
+        fast = self.plain or run
+        if fast is fused_process and records:
+            kind = type(records[0])
+            fn = FUSED.get(kind)
+            if fn is not None and all(type(r) is kind for r in records):
+                fast = fn
+        if self.metrics is not None:
+            return self.metrics.run_batch(records, fast, run)
+        return list(map(fast, records))
+
+    def run_staged(self, records: Iterable[Any],
+                   workers: Optional[List[int]] = None,
+                   queue_size: int = 1024,
+                   processes: Iterable[int] = ()) -> Iterator[Any]:
+        stages = list(self.stages)
+        counts = workers or [1] * len(stages)
+        if len(counts) != len(stages) or min(counts, default=1) < 1:
+            raise ValueError("run_staged needs one worker count of at "
+                             "least 1 per stage")
+        return self._run_staged(records, stages, counts, queue_size,
+                                set(processes))
+
+    def _run_staged(self, records: Iterable[Any],
+                    stages: List[ProcessingStage], counts: List[int],
+                    queue_size: int, pooled: Set[int]) -> Iterator[Any]:
+        queues: List[queue.Queue] = [queue.Queue(queue_size + 2)
+                                     for _ in range(len(stages) + 1)]
+        window = threading.Semaphore(queue_size)
+        cancel = threading.Event()
+        remaining = list(counts)
+        lock = threading.Lock()
+        pools = {i: ProcessPoolExecutor(max_workers=counts[i])
+                 for i in pooled}
+
+        def feed() -> None:
+            seq = 0
+            try:
+                for data in records:
+                    window.acquire()
+                    if cancel.is_set():
+                        return
+                    queues[0].put((seq, data))
+                    seq += 1
+            except Exception as e:
+                window.acquire()
+                if not cancel.is_set():
+                    queues[0].put((seq, StageFailure(e)))
+            queues[0].put(_DONE)
+
+        def work(i: int) -> None:
+            inbox, outbox = queues[i], queues[i + 1]
+            stage, pool = stages[i], pools.get(i)
+            while True:
+                item = inbox.get()
+                if item is _DONE:
+                    inbox.put(_DONE)
+                    with lock:
+                        remaining[i] -= 1
+                        last = remaining[i] == 0
+                    if last:
+                        outbox.put(_DONE)
+                    return
+                if cancel.is_set():
+                    continue
+                seq, data = item
+                if not isinstance(data, StageFailure):
+                    try:
+                        if pool is None:
+                            data = stage.process(data)
+                        else:
+                            data = pool.submit(stage.process, data).result()
+                    except Exception as e:
+                        data = StageFailure(e)
+                outbox.put((seq, data))
+
+        threads = [threading.Thread(target=feed, daemon=True)]
+        for i, count in enumerate(counts):
+            threads += [threading.Thread(target=work, args=(i,), daemon=True)
+                        for _ in range(count)]
+        for t in threads:
+            t.start()
+
+        pending: Dict[int, Any] = {}
+        expected = 0
+        try:
+            while True:
+                item = queues[-1].get()
+                if item is _DONE:
+                    break
+                seq, result = item
+                pending[seq] = result
+                while expected in pending:
+                    result = pending.pop(expected)
+                    expected += 1
+                    window.release()
+                    if isinstance(result, StageFailure):
+                        raise result.error
+                    yield result
+        finally:
+            cancel.set()
+            window.release()
+            queues[0].put(_DONE)
+            for pool in pools.values():
+                pool.shutdown(wait=False, cancel_futures=True)
+
+
+class FileAdapter(ProcessingPipeline):
+    @abstractmethod
+    def ingest(self, path: str) -> Iterator[Any]:
+        ...
+
+    def export(self, path: str, sink: str) -> int:
+        count = 0
+        with open(sink, 'w', buffering=1 << 20) as out:
+            for result in self.ingest(path):
+                out.write(f"{result}\n")
+                count += 1
+        return count
+
+
+class JSONAdapter(FileAdapter):
+    accepts = (dict,)
 
-class JSONAdapter(ProcessingPipeline):
     def __init__(self, id: str) -> None:
         super().__init__()
         self.id = id
 
-    def add_stage(self, stage: ProcessingStage) -> None:
-        self.stages.append(stage)
-
     def process(self, data: Dict) -> Union[str, Any]:
         for s in self.stages:
             data = s.process(data)
         return data
 
+    def ingest(self, path: str) -> Iterator[Any]:
+        run = self.compile()
+        with open(path, encoding='utf-8', buffering=1 << 20) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    data = json.loads(line)
+                except ValueError:
+                    yield "Error detected in Stage 1: Invalid data format"
+                    continue
+                if not isinstance(data, dict):
+                    yield "Error detected in Stage 1: Invalid type input"
+                    continue
+                yield run(data)
+
+
+class CSVAdapter(FileAdapter):
+    accepts = (str,)
 
-class CSVAdapter(ProcessingPipeline):
     def __init__(self, id: str) -> None:
         super().__init__()
         self.id = id
 
-    def add_stage(self, stage: ProcessingStage) -> None:
-        self.stages.append(stage)
-
     def process(self, data: str) -> Union[str, Any]:
         for s in self.stages:
             data = s.process(data)
         return data
 
+    def ingest(self, path: str, header: bool = False) -> Iterator[Any]:
+        run = self.compile()
+        with open(path, newline='', encoding='utf-8',
+                  buffering=1 << 20) as f:
+            rows = csv.reader(f)
+            if header:
+                next(rows, None)
+            for row in rows:
+                yield run(Record(Format.CSV, row, True))
+
 
 class StreamAdapter(ProcessingPipeline):
+    accepts = (list, array)
+
     def __init__(self, id: str) -> None:
         super().__init__()
         self.id = id
 
-    def add_stage(self, stage: ProcessingStage) -> None:
-        self.stages.append(stage)
-
     def process(self, data: List) -> Union[str, Any]:
         for s in self.stages:
             data = s.process(data)
@@ -170,22 +713,122 @@ class StreamAdapter(ProcessingPipeline):
 
 class NexusManager():
     def __init__(self) -> None:
-        self.pipelines = []
-
-    def add_pipeline(self, pipeline: ProcessingPipeline) -> None:
-        self.pipelines.append(pipeline)
+        self.pipelines: Dict[str, ProcessingPipeline] = {}
+        self.routes: Dict[type, ProcessingPipeline] = {}
+        self.chains: Dict[str, Callable[[Any], Any]] = {}
+        self.chain_sources: Dict[str, Tuple[Callable[[Any], Any],
+                                            List[ProcessingStage]]] = {}
+        self.chain_metrics: Dict[str, PipelineMetrics] = {}
+        self.sample_every: Optional[int] = None
+
+    def enable_metrics(self, sample_every: int = 256) -> None:
+        self.sample_every = sample_every
+        for pipeline in self.pipelines.values():
+            pipeline.enable_metrics(sample_every)
+        for name, (run, stages) in self.chain_sources.items():
+            self._instrument_chain(name, run, stages)
+
+    def _instrument_chain(self, name: str, run: Callable[[Any], Any],
+                          stages: List[ProcessingStage]) -> None:
+        self.chain_sources[name] = (run, stages)
+        if self.sample_every is None:
+            self.chains[name] = run
+            return
+        metrics = self.chain_metrics[name] = \
+            PipelineMetrics(self.sample_every)
+        self.chains[name] = metrics.instrument(run, stages)
+
+    def metrics_snapshot(self) -> Dict[str, Any]:
+        snapshot: Dict[str, Any] = {}
+        for name, pipeline in self.pipelines.items():
+            if pipeline.metrics is not None:
+                snapshot[name] = pipeline.metrics.snapshot()
+        for name, metrics in self.chain_metrics.items():
+            snapshot[f"chain:{name}"] = metrics.snapshot()
+        return snapshot
+
+    def add_pipeline(self, pipeline: ProcessingPipeline,
+                     accepts: Optional[type] = None) -> None:
+        if pipeline.id in self.pipelines:
+            raise ValueError(f"pipeline {pipeline.id} already registered")
+        self.pipelines[pipeline.id] = pipeline
+        if self.sample_every is not None:
+            pipeline.enable_metrics(self.sample_every)
+        for kind in (accepts,) if accepts else pipeline.accepts:
+            self.routes.setdefault(kind, pipeline)
+
+    def route(self, kind: type, name: str) -> None:
+        self.routes[kind] = self.pipelines[name]
+
+    def add_chain(self, name: str, nodes: List[str],
+                  edges: Optional[List[Tuple[str, str]]] = None) -> None:
+        if edges is None:
+            edges = list(zip(nodes, nodes[1:]))
+        parents: Dict[str, str] = {}
+        for src, dst in edges:
+            if dst in parents:
+                raise ValueError(f"chain {name}: {dst} has several inputs")
+            parents[dst] = src
+        graph = TopologicalSorter({n: [parents[n]] if n in parents else []
+                                   for n in nodes})
+        order = [self.pipelines[n] for n in graph.static_order()]
+        sinks = [n for n in nodes if n not in {src for src, _ in edges}]
+        linear = len(sinks) == 1 and len(edges) == len(nodes) - 1 and \
+            len({src for src, _ in edges}) == len(edges)
+        if linear:
+            stages = [s for p in order for s in p.stages]
+            fused = fuse(stages)
+            if fused is not None:
+                self._instrument_chain(name, fused, stages)
+                return
+
+        def run(data: Any) -> Any:
+            outputs: Dict[str, Any] = {}
+            for p in order:
+                parent = parents.get(p.id)
+                source = data if parent is None else outputs[parent]
+                outputs[p.id] = p.process(source)
+            if len(sinks) == 1:
+                return outputs[sinks[0]]
+            return {n: outputs[n] for n in sinks}
+        self._instrument_chain(name, run, [])
+
+    def resolve(self, kind: type) -> Optional[ProcessingPipeline]:
+        pipeline = self.routes.get(kind)
+        if pipeline is None:
+            for base in kind.__mro__[1:]:
+                if base in self.routes and base is not object:
+                    pipeline = self.routes[kind] = self.routes[base]
+                    break
+        return pipeline
+
+    def process_many(self, records: Iterable[Any]) -> List[Any]:
+        groups: Dict[type, Tuple[List[int], List[Any]]] = {}
+        total = 0
+        for i, record in enumerate(records):
+            indices, members = groups.setdefault(type(record), ([], []))
+            indices.append(i)
+            members.append(record)
+            total = i + 1
+
+        results: List[Any] = [None] * total
+        for kind, (indices, members) in groups.items():
+            pipeline = self.resolve(kind)
+            if pipeline is None:
+                outputs = members
+            else:
+                outputs = pipeline.process_batch(members)
+            for i, output in zip(indices, outputs):
+                results[i] = output
+        return results
 
     def process_pipeline(self, data: Any, mode: str = 'simple') -> Any:
-        if isinstance(data, Dict) and mode == 'chaining':
-            for i in range(3, 6):
-                data = self.pipelines[i].process(data)
-        elif isinstance(data, Dict):
-            return self.pipelines[0].process(data)
-        elif isinstance(data, str):
-            return self.pipelines[1].process(data)
-        elif isinstance(data, List):
-            return self.pipelines[2].process(data)
-        return data
+        if mode != 'simple':
+            return self.chains[mode](data)
+        pipeline = self.resolve(type(data))
+        if pipeline is None:
+            return data
+        return pipeline.compile()(data)
 
 
 def ft_nexus_pipeline() -> None:
@@ -248,6 +891,7 @@ def ft_nexus_pipeline() -> None:
     json3 = JSONAdapter("JSON_003")
     json3.add_stage(OutputStage())
     manager.add_pipeline(json3)
+    manager.add_chain('chaining', ["JSON_001", "JSON_002", "JSON_003"])
 
     s = time.perf_counter()
     chain_data = {"sensor": "temp", "value": 80.5, "unit": "F"}
@@ -0,0 +1,70 @@
+import threading
+import time
+import unittest
+from typing import Any, Iterator
+
+from nexus_pipeline import (InputStage, JSONAdapter, OutputStage,
+                            TransformStage)
+
+
+def reading(value: float) -> dict:
+    return {"sensor": "temp", "value": value, "unit": "C"}
+
+
+class Explode:
+    def process(self, data: Any) -> Any:
+        raise KeyError("stage failed")
+
+
+class StagedTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.pipeline = JSONAdapter("STAGED")
+        for stage in (InputStage(), TransformStage(), OutputStage()):
+            self.pipeline.add_stage(stage)
+        self.threads = threading.active_count()
+
+    def assertThreadsStopped(self) -> None:
+        deadline = time.monotonic() + 5
+        while threading.active_count() > self.threads and \
+                time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(threading.active_count(), self.threads)
+
+    def test_matches_serial_order(self) -> None:
+        records = [reading(i % 60) for i in range(500)]
+        expected = [self.pipeline.process(r) for r in records]
+        results = self.pipeline.run_staged(records, [1, 3, 2], queue_size=8)
+        self.assertEqual(list(results), expected)
+        self.assertThreadsStopped()
+
+    def test_stage_error_is_raised(self) -> None:
+        self.pipeline.add_stage(Explode())
+        with self.assertRaises(KeyError):
+            list(self.pipeline.run_staged([reading(1)] * 20,
+                                          queue_size=4))
+        self.assertThreadsStopped()
+
+    def test_source_error_is_raised(self) -> None:
+        def source() -> Iterator[dict]:
+            yield reading(1)
+            raise RuntimeError("source failed")
+
+        with self.assertRaises(RuntimeError):
+            list(self.pipeline.run_staged(source()))
+        self.assertThreadsStopped()
+
+    def test_close_stops_threads(self) -> None:
+        results = self.pipeline.run_staged(iter([reading(1)] * 10000),
+                                           queue_size=2)
+        next(results)
+        results.close()
+        self.assertThreadsStopped()
+
+    def test_worker_counts_are_validated(self) -> None:
+        for workers in ([1, 1], [1, 0, 1]):
+            with self.assertRaises(ValueError):
+                self.pipeline.run_staged([reading(1)], workers)
+
+
+if __name__ == "__main__":
+    unittest.main()